@@ -1,10 +1,19 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyarrow import csv as pacsv
+import hashlib
 import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import partial
 from airflow import DAG
 from airflow.operators.python_operator import PythonOperator
 from airflow.utils.dates import days_ago
 from utils.database import insert_to_sql, test_connection
+from utils.storage import stream_parquet
 from utils.transformation import (
     clean_conditions_data, clean_encounter_data, clean_medications_data,
     clean_patients_data, clean_symptoms_data, merge_patients_and_gender, merge_datasets
@@ -17,41 +26,227 @@ logger = logging.getLogger(__name__)
 #
 file_path = "/home/akhil/airflow/dags/data/"
 
-# File paths to the datasets being processed
-file_paths = {
+# Source CSV files, converted once to Parquet by `ensure_parquet`
+csv_paths = {
     "conditions": f"{file_path}conditions.csv",
-    "encounters": f"{file_path}encounters.parquet",
     "medications": f"{file_path}medications.csv",
     "patients": f"{file_path}patients.csv",
     "symptoms": f"{file_path}symptoms.csv",
     "patients_gender": f"{file_path}patient_gender.csv"
 }
 
-def read_file(file_key, **kwargs):
+# File paths to the datasets being processed
+file_paths = {
+    "conditions": f"{file_path}conditions.parquet",
+    "encounters": f"{file_path}encounters.parquet",
+    "medications": f"{file_path}medications.parquet",
+    "patients": f"{file_path}patients.parquet",
+    "symptoms": f"{file_path}symptoms.parquet",
+    "patients_gender": f"{file_path}patients_gender.parquet"
+}
+
+# Encounter columns that survive `clean_encounter_data` (REASONDESCRIPTION is dropped)
+ENC_KEEP_COLS = [
+    "Id", "START", "STOP", "PATIENT", "ORGANIZATION", "PROVIDER", "PAYER", "ENCOUNTERCLASS",
+    "CODE", "DESCRIPTION", "BASE_ENCOUNTER_COST", "TOTAL_CLAIM_COST", "PAYER_COVERAGE", "REASONCODE"
+]
+
+# Columns each cleaning function actually keeps; None reads every column
+REQUIRED_COLS = {
+    "conditions": ["PATIENT", "ENCOUNTER"],
+    "encounters": ENC_KEEP_COLS,
+    "medications": [
+        "PATIENT", "PAYER", "ENCOUNTER", "CODE", "DESCRIPTION", "BASE_COST", "DISPENSES", "TOTALCOST"
+    ],
+    "patients": None,
+    "symptoms": ["PATIENT", "AGE_BEGIN", "AGE_END", "PATHOLOGY", "NUM_SYMPTOMS", "SYMPTOMS"],
+    "patients_gender": None
+}
+
+# Explicit column types for the CSV files so PyArrow does not re-infer them on every run.
+# Dates and free-form values that the cleaning functions coerce themselves are kept as strings.
+SCHEMAS = {
+    "conditions": {
+        "START": pa.string(), "STOP": pa.string(), "PATIENT": pa.string(),
+        "ENCOUNTER": pa.string(), "CODE": pa.int64(), "DESCRIPTION": pa.string()
+    },
+    "medications": {
+        "START": pa.string(), "STOP": pa.string(), "PATIENT": pa.string(),
+        "PAYER": pa.string(), "ENCOUNTER": pa.string(), "CODE": pa.int64(),
+        "DESCRIPTION": pa.string(), "BASE_COST": pa.float64(), "PAYER_COVERAGE": pa.float64(),
+        "DISPENSES": pa.int64(), "TOTALCOST": pa.float64(), "REASONCODE": pa.string(),
+        "REASONDESCRIPTION": pa.string()
+    },
+    "patients": {
+        "PATIENT_ID": pa.string(), "BIRTHDATE": pa.string(), "DEATHDATE": pa.string(),
+        "FIRST": pa.string(), "LAST": pa.string(), "GENDER": pa.string(),
+        "BIRTHPLACE": pa.string(), "COUNTY": pa.string(), "LAT": pa.string(),
+        "LON": pa.string(), "INCOME": pa.string()
+    },
+    "symptoms": {
+        "PATIENT": pa.string(), "GENDER": pa.string(), "RACE": pa.string(),
+        "ETHNICITY": pa.string(), "AGE_BEGIN": pa.int64(), "AGE_END": pa.float64(),
+        "PATHOLOGY": pa.string(), "NUM_SYMPTOMS": pa.int64(), "SYMPTOMS": pa.string()
+    },
+    "patients_gender": {
+        "Id": pa.string(), "GENDER": pa.string()
+    }
+}
+
+# Local directory where intermediate Parquet files are staged between tasks
+staging_path = "/tmp/"
+
+# Datasets streamed in row batches instead of being loaded whole, to cap peak memory
+chunked_files = {"encounters"}
+batch_size = 1_000_000
+
+def ensure_parquet(file_key):
     """
-    Read a specific file and push its DataFrame to XCom.
+    Convert a source CSV file to Parquet, skipping the work if the Parquet copy is up to date
+    and was parsed with the current schema and options.
+
+    Args:
+        file_key (str): The key corresponding to the file in `csv_paths` and `SCHEMAS`.
+    """
+    csv_path, parquet_path = csv_paths[file_key], file_paths[file_key]
+    if not os.path.exists(csv_path):
+        # Only the Parquet copy is deployed, so there is nothing to convert
+        return
+
+    # Parse the CSV with PyArrow's multithreaded reader and the declared column types
+    read_options = pacsv.ReadOptions(use_threads=True, block_size=16 << 20, encoding="ISO-8859-1")
+    convert_options = pacsv.ConvertOptions(column_types=SCHEMAS[file_key], strings_can_be_null=True)
+
+    # The Parquet copy records a fingerprint of the settings it was parsed with, so changing
+    # the declared schema or the parse options invalidates it even when the CSV is unchanged
+    fingerprint = hashlib.sha256(f"{read_options!r}{convert_options!r}".encode()).hexdigest()
+    if (os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+            and (pq.read_schema(parquet_path).metadata or {}).get(b"csv_fingerprint") == fingerprint.encode()):
+        return
+
+    table = pacsv.read_csv(csv_path, read_options=read_options, convert_options=convert_options)
+    table = table.replace_schema_metadata({"csv_fingerprint": fingerprint})
+
+    # Write to a uniquely named sibling file and move it into place atomically, so a crashed or
+    # concurrent conversion never leaves a truncated file at the final path (a plain named file,
+    # unlike mkstemp's owner-only one, gets the usual umask-derived permissions)
+    tmp_path = f"{parquet_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        pq.write_table(table, tmp_path, compression="zstd", use_dictionary=True)
+        os.replace(tmp_path, parquet_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Converted {file_key} CSV to Parquet")
+
+def read_source(file_key):
+    """
+    Read a source dataset from Parquet into an Arrow-backed DataFrame.
+
+    Only the columns listed in `REQUIRED_COLS` are read from disk.
+
+    Args:
+        file_key (str): The key corresponding to the file in `file_paths`.
+
+    Returns:
+        pandas.DataFrame: The file contents with `pd.ArrowDtype` columns.
+    """
+    if file_key in csv_paths:
+        ensure_parquet(file_key)
+    return pd.read_parquet(
+        file_paths[file_key], engine="pyarrow", columns=REQUIRED_COLS[file_key],
+        dtype_backend="pyarrow", memory_map=True
+    )
+
+def stage_source(file_key, raw_path):
+    """
+    Read a source dataset in one pass and write it to the staging path.
+
+    Args:
+        file_key (str): The key corresponding to the file in `file_paths`.
+        raw_path (str): The Parquet file to stage the data in.
+    """
+    # Read the Parquet copy of the dataset, converting it from CSV if needed
+    data = read_source(file_key)
+    data.to_parquet(raw_path, engine="pyarrow", compression="snappy")
+
+def stage_chunked_source(file_key, raw_path):
+    """
+    Copy a source Parquet dataset to the staging path one batch at a time.
+
+    Args:
+        file_key (str): The key corresponding to the file in `file_paths`.
+        raw_path (str): The Parquet file to stage the data in.
+    """
+    stream_parquet(file_paths[file_key], raw_path, batch_size, columns=REQUIRED_COLS[file_key])
+
+# Reader bound to each dataset, so per-file tuning does not need changes to `read_file`
+READERS = {
+    file_key: partial(stage_chunked_source if file_key in chunked_files else stage_source, file_key)
+    for file_key in file_paths
+}
+
+def run_staging_dir(run_id):
+    """
+    Return the staging directory of a DAG run, creating it if needed.
+
+    Each run stages its files in its own directory, so overlapping or backfilled runs never
+    read or overwrite each other's intermediate files.
+
+    Args:
+        run_id (str): The Airflow run ID.
+
+    Returns:
+        str: The staging directory, with a trailing slash.
+    """
+    run_dir = f"{staging_path}{run_id}/"
+    os.makedirs(run_dir, exist_ok=True)
+    return run_dir
+
+def read_file(file_key, run_dir):
+    """
+    Read a specific file and stage it as Parquet.
     
     Args:
         file_key (str): The key corresponding to the file in `file_paths`.
-        kwargs: Additional context from Airflow.
+        run_dir (str): The staging directory of the current DAG run.
+
+    Returns:
+        str: The path of the staged Parquet file.
 
     Raises:
         Exception: If there is an error reading the file.
     """
     try:
-        # Determine the reading method based on file type (CSV or Parquet)
-        if file_key == "encounters":
-            data = pd.read_parquet(file_paths[file_key], engine='pyarrow')
-        else:
-            data = pd.read_csv(file_paths[file_key], encoding="ISO-8859-1")
-        
-        # Log success and push the raw data to XCom
+        # Stage the raw data as Parquet so only its path travels through XCom
+        raw_path = f"{run_dir}{file_key}_raw.parquet"
+        READERS[file_key](raw_path)
+
         logger.info(f"Successfully read {file_key} file")
-        kwargs['ti'].xcom_push(key=f"{file_key}_raw", value=data)
+        return raw_path
     except Exception as e:
         logger.error(f"Error reading {file_key} file: {e}")
         raise
 
+def read_all_files(**kwargs):
+    """
+    Read every dataset in parallel threads and push a dict of staged file paths to XCom.
+
+    PyArrow releases the GIL while parsing, so one task reading all files on a thread pool
+    avoids paying Airflow's task start-up cost once per file.
+
+    Args:
+        kwargs: Additional context from Airflow.
+    """
+    file_keys = [file_key for file_key in file_paths if file_key != 'patients_gender']
+    run_dir = run_staging_dir(kwargs['run_id'])
+    with ThreadPoolExecutor(max_workers=len(file_keys)) as executor:
+        raw_paths = dict(zip(file_keys, executor.map(partial(read_file, run_dir=run_dir), file_keys)))
+
+    # Push the raw data paths to XCom
+    kwargs['ti'].xcom_push(key="raw_paths", value=raw_paths)
+
 def transform_file(file_key, transform_function, **kwargs):
     """
     Transform a specific file's data using a provided transformation function.
@@ -65,28 +260,51 @@ def transform_file(file_key, transform_function, **kwargs):
         Exception: If there is an error during data transformation.
     """
     try:
-        # Pull the raw data from XCom
-        raw_data = kwargs['ti'].xcom_pull(key=f"{file_key}_raw")
-        
-        # Apply the transformation function to the raw data
-        transformed_data = transform_function(raw_data)
+        # Pull the raw data path from XCom
+        raw_path = kwargs['ti'].xcom_pull(key="raw_paths")[file_key]
+        cleaned_path = f"{run_staging_dir(kwargs['run_id'])}{file_key}_cleaned.parquet"
+
+        if file_key in chunked_files:
+            # Transform the staged file one batch at a time
+            stream_parquet(raw_path, cleaned_path, batch_size, transform_function=transform_function)
+        else:
+            # Load the staged Parquet file and apply the transformation function
+            raw_data = pd.read_parquet(raw_path, engine="pyarrow", memory_map=True)
+            transformed_data = transform_function(raw_data)
+
+            # Stage the transformed data as Parquet
+            transformed_data.to_parquet(cleaned_path, engine="pyarrow", compression="snappy")
         
-        # Log success and push the transformed data to XCom
+        # Log success and push the transformed data path to XCom
         logger.info(f"Successfully transformed {file_key} data")
-        kwargs['ti'].xcom_push(key=f"{file_key}_cleaned", value=transformed_data)
+        kwargs['ti'].xcom_push(key=f"{file_key}_cleaned_path", value=cleaned_path)
     except Exception as e:
         logger.error(f"Error transforming {file_key} data: {e}")
         raise
 
+def read_cleaned(ti, file_key):
+    """
+    Load a transformed dataset from the Parquet file whose path was pushed to XCom.
+
+    Args:
+        ti: The Airflow task instance used to pull from XCom.
+        file_key (str): The key corresponding to the file in `file_paths`.
+
+    Returns:
+        pandas.DataFrame: The transformed dataset.
+    """
+    cleaned_path = ti.xcom_pull(key=f"{file_key}_cleaned_path")
+    return pd.read_parquet(cleaned_path, engine="pyarrow", memory_map=True)
+
 def merge_and_insert_data(**kwargs):
     """
     Merge patient data with other datasets and insert the merged dataset into the database.
 
     Steps:
         1. Retrieve and merge patient data with gender information.
-        2. Sequentially merge other datasets (symptoms, encounters, conditions, medications).
+        2. Join other datasets (symptoms, encounters, conditions, medications) in one Polars plan.
         3. Insert the final merged dataset into the database.
-        4. Save the final dataset as a CSV file.
+        4. Save the final dataset as a Parquet file.
 
     Args:
         kwargs: Context arguments passed by Airflow.
@@ -95,29 +313,21 @@ def merge_and_insert_data(**kwargs):
         Exception: If merging or database insertion fails.
     """
     try:
-        # Retrieve transformed data from XCom
+        # Retrieve transformed data from the Parquet files staged in XCom
         ti = kwargs['ti']
-        patients = ti.xcom_pull(key='patients_cleaned')
-        patients_gender = pd.read_csv(file_paths["patients_gender"], encoding="ISO-8859-1")
+        patients = read_cleaned(ti, "patients")
+        patients_gender = read_source("patients_gender")
         
         # Merge patient data with gender data
         patients = merge_patients_and_gender(patients, patients_gender)
 
-        # Sequentially merge with other datasets
-        datasets_to_merge = {
-            "symptoms": ti.xcom_pull(key='symptoms_cleaned'),
-            "encounters": ti.xcom_pull(key='encounters_cleaned'),
-            "conditions": ti.xcom_pull(key='conditions_cleaned'),
-            "medications": ti.xcom_pull(key='medications_cleaned')
-        }
-        merged_df = patients
-        for dataset, key in [
-            ("symptoms", "patient_id"),
-            ("encounters", "patient_id"),
-            ("conditions", ["encounter_id", "patient_id"]),
-            ("medications", ["encounter_id", "patient_id", "payer_id"])
-        ]:
-            merged_df = merge_datasets(merged_df, datasets_to_merge[dataset], key)
+        # Join the other datasets onto the patients in a single query plan
+        merged_df = merge_datasets(patients, [
+            (read_cleaned(ti, "symptoms"), "patient_id"),
+            (read_cleaned(ti, "encounters"), "patient_id"),
+            (read_cleaned(ti, "conditions"), ["encounter_id", "patient_id"]),
+            (read_cleaned(ti, "medications"), ["encounter_id", "patient_id", "payer_id"])
+        ])
 
         # Test database connection before insertion
         test_connection()
@@ -125,9 +335,12 @@ def merge_and_insert_data(**kwargs):
         # insert_to_sql(merged_df, "master_table")
         logger.info("Merged data inserted into database")
 
-        # Save the final merged dataset as a CSV file
-        merged_df.to_csv(f"{file_path}masters.csv", index=False)
-        logger.info("Master dataset saved as CSV")
+        # Save the final merged dataset as a Parquet file
+        merged_df.to_parquet(
+            f"{file_path}masters.parquet", engine="pyarrow", compression="zstd",
+            use_dictionary=True, row_group_size=1_000_000, index=False
+        )
+        logger.info("Master dataset saved as Parquet")
     except Exception as e:
         logger.error(f"Error during merge and insert: {e}")
         raise
@@ -152,17 +365,13 @@ dag = DAG(
     catchup=False  # Do not backfill missed runs
 )
 
-# Define tasks for reading files
-read_tasks = {}
-for file_key in file_paths.keys():
-    if file_key != 'patients_gender':
-        read_tasks[file_key] = PythonOperator(
-            task_id=f'read_{file_key}_file',  # Unique task ID
-            python_callable=read_file,  # Function to execute
-            op_kwargs={'file_key': file_key},  # Pass file key as an argument
-            provide_context=True,  # Enable context passing
-            dag=dag
-        )
+# Define a single task that reads all files in parallel
+read_all_files_task = PythonOperator(
+    task_id='read_all_files',  # Unique task ID
+    python_callable=read_all_files,  # Function to execute
+    provide_context=True,  # Enable context passing
+    dag=dag
+)
 
 # Define tasks for transforming data
 transform_tasks = {
@@ -191,10 +400,8 @@ merge_and_insert_task = PythonOperator(
 )
 
 # Set task dependencies
-# Each file read task is followed by its respective transformation task
-for file_key in file_paths.keys():
-    if file_key in read_tasks and file_key in transform_tasks_operators:  # Ensure task exists
-        read_tasks[file_key] >> transform_tasks_operators[file_key]
+# Reading all files is followed by every transformation task
+read_all_files_task >> list(transform_tasks_operators.values())
 
 # All transformation tasks must complete before merging and inserting
 list(transform_tasks_operators.values()) >> merge_and_insert_task
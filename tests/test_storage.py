@@ -0,0 +1,54 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.storage import stream_parquet
+from utils.transformation import clean_encounter_data
+
+
+def test_stream_parquet_cleans_encounters_across_batches(tmp_path):
+    # The first batch holds one patient and the second holds 200, so per-batch
+    # categoricals would need wider dictionary indices after the first batch
+    patients = ['P0'] * 200 + [f'P{i}' for i in range(200)]
+    rows = len(patients)
+    source = pa.table({
+        'Id': [f'e{i}' for i in range(rows)],
+        'START': ['2020-01-01'] * rows,
+        'STOP': ['2020-01-02'] * rows,
+        'PATIENT': patients,
+        'PAYER': ['pay1'] * rows,
+        'CODE': pa.array(range(rows), pa.int64()),
+        'BASE_ENCOUNTER_COST': pa.array([1.5] * rows),
+        'TOTAL_CLAIM_COST': pa.array([2.5] * rows),
+        'PAYER_COVERAGE': pa.array([0.5] * rows),
+        'REASONCODE': pa.array([None] * rows, pa.int64())
+    })
+    pq.write_table(source, tmp_path / 'raw.parquet')
+
+    stream_parquet(
+        str(tmp_path / 'raw.parquet'), str(tmp_path / 'cleaned.parquet'), batch_size=200,
+        transform_function=clean_encounter_data
+    )
+
+    cleaned = pd.read_parquet(tmp_path / 'cleaned.parquet')
+    assert len(cleaned) == rows
+    assert cleaned['patient_id'].tolist() == [patient.lower() for patient in patients]
+    assert cleaned['code'].tolist() == list(range(rows))
+
+
+def test_stream_parquet_writes_an_empty_source(tmp_path):
+    source = pa.table({
+        'Id': pa.array([], pa.string()),
+        'PATIENT': pa.array([], pa.string()),
+        'CODE': pa.array([], pa.int64())
+    })
+    pq.write_table(source, tmp_path / 'raw.parquet')
+
+    stream_parquet(
+        str(tmp_path / 'raw.parquet'), str(tmp_path / 'projected.parquet'), batch_size=10,
+        columns=['Id', 'CODE']
+    )
+
+    projected = pq.read_table(tmp_path / 'projected.parquet')
+    assert projected.num_rows == 0
+    assert projected.column_names == ['Id', 'CODE']
@@ -0,0 +1,49 @@
+import pandas as pd
+import pyarrow as pa
+
+from utils.transformation import categorize_ids, clean_name, map_distinct, merge_datasets
+
+
+def test_merge_datasets_keeps_unmatched_left_rows():
+    patients = categorize_ids(pd.DataFrame({
+        'patient_id': ['p1', 'p2', 'p3'],
+        'first_name': ['Abe', 'Jane', 'Lee']
+    }))
+    encounters = categorize_ids(pd.DataFrame({
+        'encounter_id': ['e1', 'e2', None],
+        'patient_id': ['p1', 'p1', 'p3'],
+        'payer_id': ['pay1', 'pay2', 'pay1']
+    }))
+    medications = categorize_ids(pd.DataFrame({
+        'encounter_id': ['e1', None],
+        'patient_id': ['p1', 'p3'],
+        'payer_id': ['pay1', 'pay1'],
+        'drug_code': pd.array([313782, 834061], dtype='Int32')
+    }))
+
+    merged = merge_datasets(patients, [
+        (encounters, 'patient_id'),
+        (medications, ['encounter_id', 'patient_id', 'payer_id'])
+    ])
+
+    # Rows keep the order of the patients
+    assert merged['patient_id'].tolist() == ['p1', 'p1', 'p2', 'p3']
+    assert merged['encounter_id'].tolist()[:2] == ['e1', 'e2']
+
+    # p2 has no encounters, so its encounter and payer IDs are missing
+    assert merged['encounter_id'].isna().tolist() == [False, False, True, True]
+    assert merged['payer_id'].isna().tolist() == [False, False, True, False]
+
+    # Missing encounter IDs do not join to each other
+    assert merged['drug_code'].isna().tolist() == [False, True, True, True]
+
+    # Narrow integer columns survive the Polars round trip
+    assert merged['drug_code'].dtype == pd.ArrowDtype(pa.int32())
+
+
+def test_map_distinct_accepts_chunked_columns():
+    values = pa.chunked_array([['abe604', None], ['abe604', 'jane12']])
+
+    cleaned = map_distinct(values, clean_name)
+
+    assert cleaned.to_pylist() == ['Abe', None, 'Abe', 'Jane']
@@ -1,5 +1,8 @@
+import io
+from functools import lru_cache
 import pandas as pd
-from sqlalchemy import create_engine
+import psycopg2
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -10,9 +13,12 @@ DB_PASSWORD = 'Password'     # Password for the database user
 DB_PORT = "5432"             # Port number for PostgreSQL (default: 5432)
 DB_NAME = 'health'           # Name of the target database
 
+@lru_cache(maxsize=1)
 def create_sqlalchemy_engine():
     """
     Creates a SQLAlchemy engine for database connection.
+
+    The engine is created once per process and reused, so callers share its connection pool.
     
     Returns:
         sqlalchemy.engine.Engine: The engine object to interact with the database.
@@ -24,7 +30,12 @@ def create_sqlalchemy_engine():
         connection_string = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
         
         # Create the SQLAlchemy engine
-        engine = create_engine(connection_string)
+        engine = create_engine(
+            connection_string,
+            pool_size=8,
+            pool_pre_ping=True,  # Validate pooled connections before handing them out
+            pool_recycle=1800  # Replace connections older than 30 minutes
+        )
         return engine
     except SQLAlchemyError as e:
         # Print and raise the error for debugging purposes
@@ -33,7 +44,7 @@ def create_sqlalchemy_engine():
 
 def insert_to_sql(df, table_name, if_exists='replace'):
     """
-    Insert a pandas DataFrame into a PostgreSQL table using SQLAlchemy.
+    Insert a pandas DataFrame into a PostgreSQL table, streaming the rows with COPY.
 
     Args:
         df (pandas.DataFrame): The DataFrame containing data to be inserted.
@@ -42,27 +53,39 @@ def insert_to_sql(df, table_name, if_exists='replace'):
                                    Options: 'fail', 'replace', 'append'. Default is 'replace'.
 
     Raises:
-        SQLAlchemyError: If there is an error during the insertion process.
+        SQLAlchemyError: If there is an error creating the table.
+        psycopg2.Error: If there is an error copying the rows.
     """
     try:
-        # Create a database engine
+        # Get the shared database engine
         engine = create_sqlalchemy_engine()
         
-        # Use pandas' to_sql method to insert the DataFrame into the database
-        df.to_sql(
-            name=table_name, 
-            con=engine, 
-            if_exists=if_exists, 
-            index=False  # Do not include the DataFrame index as a database column
-        )
+        # Serialize the rows for COPY before opening the transaction
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        columns = ", ".join('"{}"'.format(str(col).replace('"', '""')) for col in df.columns)
+
+        # Create the table and copy the rows in one transaction, so a failed COPY
+        # rolls back the `if_exists` DDL instead of leaving an empty table behind
+        with engine.begin() as connection:
+            # Create the table from the DataFrame's schema, honouring `if_exists`
+            df.head(0).to_sql(
+                name=table_name, 
+                con=connection, 
+                if_exists=if_exists, 
+                index=False  # Do not include the DataFrame index as a database column
+            )
+
+            # Stream the rows through COPY on the same underlying DBAPI connection,
+            # naming the columns so appends match by name rather than position
+            with connection.connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY "{table_name}" ({columns}) FROM STDIN WITH CSV', buffer)
         print(f"Successfully inserted data into table: {table_name}")
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, psycopg2.Error) as e:
         # Print and raise the error if the insertion fails
         print(f"Error inserting data into {table_name}: {e}")
         raise
-    finally:
-        # Dispose of the engine to release database resources
-        engine.dispose()
 
 def test_connection():
     """
@@ -72,11 +95,12 @@ def test_connection():
         bool: True if the connection is successful, False otherwise.
     """
     try:
-        # Create a database engine
+        # Get the shared database engine
         engine = create_sqlalchemy_engine()
         
         # Establish a connection using the engine
         with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
             print("Database connection successful!")
             return True
     except SQLAlchemyError as e:
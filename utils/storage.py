@@ -0,0 +1,36 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def stream_parquet(source_path, target_path, batch_size, columns=None, transform_function=None):
+    """
+    Copies a Parquet file batch by batch, optionally transforming each batch on the way,
+    so that only one batch is held in memory at a time.
+    """
+    # Pre-buffering coalesces the column chunk reads and overlaps I/O with decoding
+    source = pq.ParquetFile(source_path, memory_map=True, buffer_size=1 << 20, pre_buffer=True)
+    batches = source.iter_batches(batch_size=batch_size, columns=columns)
+    if source.metadata.num_rows == 0:
+        # An empty source yields no batches; stream one empty batch so the target is still written
+        schema = source.schema_arrow
+        if columns is not None:
+            schema = pa.schema([schema.field(name) for name in columns])
+        batches = [pa.RecordBatch.from_pylist([], schema=schema)]
+
+    writer = None
+    try:
+        for batch in batches:
+            if transform_function is None:
+                table = pa.Table.from_batches([batch])
+            else:
+                data = transform_function(batch.to_pandas(types_mapper=pd.ArrowDtype))
+                table = pa.Table.from_pandas(data, preserve_index=False)
+
+            # The first batch fixes the output schema; later batches are cast to it
+            if writer is None:
+                writer = pq.ParquetWriter(target_path, table.schema, compression="snappy")
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
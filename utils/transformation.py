@@ -1,6 +1,77 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import polars as pl
+from pandas.api.types import union_categoricals
 from datetime import datetime
 
+# Copy-on-Write is always on from pandas 3.0; enable it explicitly on earlier versions
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Pattern for the trailing digits appended to synthetic patient names
+_TRAIL_DIGITS = r'\d+$'
+
+# Identifier columns shared across datasets and used as join keys
+ID_COLS = ['patient_id', 'encounter_id', 'payer_id']
+
+# Helper to store identifier columns as categoricals
+def categorize_ids(df):
+    """
+    Converts the identifier columns present in the dataset (a DataFrame or a dict
+    of columns) to categoricals, replacing repeated ID strings with integer codes
+    and a dictionary.
+    """
+    for col in ID_COLS:
+        if col in df:
+            df[col] = df[col].astype('category')
+
+    return df
+
+# Helper to view a Series as an Arrow array for use with pyarrow.compute kernels
+def to_arrow(series):
+    """
+    Returns the column as an Arrow Array, or as a ChunkedArray when the Series is backed by
+    several chunks, reusing the buffers when the Series is Arrow-backed.
+    """
+    return pa.array(series)
+
+# Helper to run string kernels once per distinct value of a column
+def map_distinct(values, kernel):
+    """
+    Applies an Arrow string kernel to the distinct values of the column only and
+    expands the result back through the dictionary indices, so heavily repeated
+    values such as names and places are cleaned once each.
+    """
+    # A single dictionary is needed, so multi-chunk columns are combined first
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    encoded = pc.dictionary_encode(values)
+    return pc.take(kernel(encoded.dictionary), encoded.indices)
+
+# String kernels fusing every cleaning step applied to a patient column
+def clean_name(names):
+    """
+    Removes the trailing digits from names and capitalizes them.
+    """
+    return pc.utf8_capitalize(pc.replace_substring_regex(names, _TRAIL_DIGITS, ''))
+
+def clean_place(places):
+    """
+    Trims surrounding whitespace from place names and titlecases them.
+    """
+    return pc.utf8_title(pc.utf8_trim_whitespace(places))
+
+def clean_county(counties):
+    """
+    Removes the 'County' suffix from county names.
+    """
+    return pc.if_else(
+        pc.ends_with(counties, 'County'),
+        pc.utf8_trim_whitespace(pc.utf8_slice_codeunits(counties, 0, -6)),
+        counties
+    )
+
 # Function to clean and standardize the conditions dataset
 def clean_conditions_data(df):
     """
@@ -8,21 +79,23 @@ def clean_conditions_data(df):
     ensuring clean and uniform patient and condition information.
     """
     # Rename columns to meaningful and standardized names
-    df.rename(columns={
+    df = df.rename(columns={
         'PATIENT': 'patient_id',
         'ENCOUNTER': 'encounter_id',
         'CODE': 'conditional_code',
         'DESCRIPTION': 'conditional_description'
-    }, inplace=True)
+    })
 
-    # Standardize text formatting for descriptions and patient IDs
-    df['conditional_description'] = df['conditional_description'].str.title()
-    df['patient_id'] = df['patient_id'].str.lower()
+    # Collect the columns needed for analysis (unneeded ones may already be projected away at read time)
+    out = dict(df.drop(columns=['START', 'STOP', 'conditional_code', 'conditional_description'], errors='ignore').items())
 
-    # Drop unnecessary columns for analysis
-    df.drop(columns=['START', 'STOP', 'conditional_code', 'conditional_description'], inplace=True)
+    # Standardize patient IDs
+    out['patient_id'] = out['patient_id'].str.lower()
 
-    return df
+    # Store identifiers as categoricals so joins compare integer codes
+    out = categorize_ids(out)
+
+    return pd.DataFrame(out, copy=False)
 
 # Function to clean and process medications data
 def clean_medications_data(df):
@@ -31,7 +104,7 @@ def clean_medications_data(df):
     with normalized text, converted numeric values, and consistent formatting.
     """
     # Rename columns for clarity and consistency
-    df.rename(columns={
+    df = df.rename(columns={
         'START': 'start_date',
         'STOP': 'end_date',
         'PATIENT': 'patient_id',
@@ -45,30 +118,32 @@ def clean_medications_data(df):
         'TOTALCOST': 'total_cost',
         'REASONCODE': 'reason_code',
         'REASONDESCRIPTION': 'reason_description'
-    }, inplace=True)
-
-    # Normalize text data (lowercase and titlecase where applicable)
-    columns_to_lowercase = ['patient_id', 'payer_id', 'encounter_id', 'drug_description']
-    for col in columns_to_lowercase:
-        df[col] = df[col].str.lower()
+    })
 
-    df['drug_description'] = df['drug_description'].str.title()
+    # Drop irrelevant or redundant columns before any conversion work is spent on them
+    # (they may already be projected away at read time)
+    out = dict(df.drop(columns=['reason_description', 'reason_code', 'payer_coverage', 'start_date', 'end_date'], errors='ignore').items())
 
-    # Convert specific columns to numeric types, handling errors gracefully
-    int_columns = ['drug_code', 'dispensed_quantity', 'reason_code']
-    df[int_columns] = df[int_columns].apply(pd.to_numeric, errors='coerce', downcast='integer')
+    # Normalize text data (lowercase and titlecase where applicable) with Arrow kernels;
+    # titlecasing already lowercases the rest of each word, so descriptions skip the lowercase pass
+    columns_to_lowercase = ['patient_id', 'payer_id', 'encounter_id']
+    out.update({
+        col: pd.arrays.ArrowExtensionArray(pc.utf8_lower(to_arrow(out[col])))
+        for col in columns_to_lowercase
+    })
 
-    float_columns = ['base_cost', 'total_cost']
-    df[float_columns] = df[float_columns].apply(pd.to_numeric, errors='coerce', downcast='float')
+    out['drug_description'] = pd.arrays.ArrowExtensionArray(pc.utf8_title(to_arrow(out['drug_description'])))
 
-    # Convert date columns to datetime objects and remove timezone information
-    df['start_date'] = pd.to_datetime(df['start_date'], errors='coerce').dt.tz_localize(None)
-    df['end_date'] = pd.to_datetime(df['end_date'], errors='coerce').dt.tz_localize(None)
+    # Store identifiers as categoricals so joins compare integer codes
+    out = categorize_ids(out)
 
-    # Drop irrelevant or redundant columns
-    df.drop(columns=['reason_description', 'reason_code', 'payer_coverage', 'start_date', 'end_date'], inplace=True)
-
-    return df
+    # Convert the numeric columns to narrow types in a single pass
+    return pd.DataFrame(out, copy=False).astype({
+        'drug_code': 'Int32',
+        'dispensed_quantity': 'Int32',
+        'base_cost': 'float32',
+        'total_cost': 'float32'
+    })
 
 # Function to clean and standardize patient data
 def clean_patients_data(df):
@@ -77,7 +152,7 @@ def clean_patients_data(df):
     and ensuring consistent data formatting across all patient records.
     """
     # Rename columns to standardized names
-    df.rename(columns={
+    df = df.rename(columns={
         'PATIENT_ID': 'patient_id',
         'BIRTHDATE': 'birth_date',
         'DEATHDATE': 'death_date',
@@ -88,37 +163,43 @@ def clean_patients_data(df):
         'LAT': 'latitude',
         'LON': 'longitude',
         'INCOME': 'income'
-    }, inplace=True)
+    })
 
     # Remove irrelevant columns
-    df.drop(columns=['GENDER'], inplace=True)
+    out = dict(df.drop(columns=['GENDER']).items())
 
     # Standardize patient ID to lowercase
-    df['patient_id'] = df['patient_id'].str.lower()
+    out['patient_id'] = pd.arrays.ArrowExtensionArray(pc.utf8_lower(to_arrow(out['patient_id'])))
 
     # Convert birth and death dates to datetime format
-    df['birth_date'] = pd.to_datetime(df['birth_date'], errors='coerce')
-    df['death_date'] = pd.to_datetime(df['death_date'], errors='coerce')
-
-    # Standardize names by removing trailing digits and capitalizing
-    df['first_name'] = df['first_name'].str.replace(r'\d+$', '', regex=True).str.capitalize()
-    df['last_name'] = df['last_name'].str.replace(r'\d+$', '', regex=True).str.capitalize()
-
-    # Clean and standardize birth place and county information
-    df['birth_place'] = df['birth_place'].str.strip().str.title()
-    df['county'] = df['county'].apply(lambda x: x[:-6].strip() if isinstance(x, str) and x.endswith('County') else x)
+    out['birth_date'] = pd.to_datetime(out['birth_date'], errors='coerce')
+    out['death_date'] = pd.to_datetime(out['death_date'], errors='coerce')
+
+    # Standardize names, birth place and county, cleaning each distinct value only once
+    for col, kernel in [
+        ('first_name', clean_name),
+        ('last_name', clean_name),
+        ('birth_place', clean_place),
+        ('county', clean_county)
+    ]:
+        out[col] = pd.arrays.ArrowExtensionArray(map_distinct(to_arrow(out[col]), kernel))
 
     # Process and clean latitude and longitude values
-    df['latitude'] = df['latitude'].apply(lambda x: str(x).lstrip("'") if isinstance(x, str) else x)
-    df['longitude'] = pd.to_numeric(df['longitude'].astype(str).str.strip(), errors='coerce')
+    latitude = pc.utf8_ltrim(to_arrow(out['latitude']).cast(pa.string()), characters="'")
+    out['latitude'] = pd.to_numeric(pd.arrays.ArrowExtensionArray(latitude), errors='coerce')
+    out['longitude'] = pd.to_numeric(out['longitude'].astype(str).str.strip(), errors='coerce')
 
     # Convert income to numeric type
-    df['income'] = pd.to_numeric(df['income'], errors='coerce')
+    out['income'] = pd.to_numeric(out['income'], errors='coerce')
 
     # Ensure all column names are lowercase
-    df.columns = df.columns.str.lower()
+    out = {name.lower(): col for name, col in out.items()}
 
-    return df
+    # Store identifiers as categoricals so joins compare integer codes
+    out = categorize_ids(out)
+
+    # Downcast numeric columns to the narrowest safe types
+    return pd.DataFrame(out, copy=False).astype({'income': 'Int32', 'latitude': 'float32', 'longitude': 'float32'})
 
 # Function to clean and process symptoms data
 def clean_symptoms_data(df):
@@ -127,7 +208,7 @@ def clean_symptoms_data(df):
     with normalized patient identifiers and symptom information.
     """
     # Rename columns to standardized names
-    df.rename(columns={
+    df = df.rename(columns={
         'PATIENT': 'patient_id',
         'RACE': 'race',
         'ETHNICITY': 'symptoms_ethnicity',
@@ -136,19 +217,22 @@ def clean_symptoms_data(df):
         'PATHOLOGY': 'pathology',
         'NUM_SYMPTOMS': 'num_symptoms',
         'SYMPTOMS': 'symptoms'
-    }, inplace=True)
-
-    # Standardize text formatting for pathology and patient IDs
-    df['pathology'] = df['pathology'].str.title()
-    df['patient_id'] = df['patient_id'].str.lower()
+    })
 
     # Drop irrelevant columns
-    df.drop(columns=['GENDER', 'race', 'symptoms_ethnicity'], inplace=True)
+    out = dict(df.drop(columns=['GENDER', 'race', 'symptoms_ethnicity'], errors='ignore').items())
+
+    # Standardize text formatting for pathology and patient IDs
+    out['pathology'] = out['pathology'].str.title()
+    out['patient_id'] = out['patient_id'].str.lower()
 
     # Ensure all column names are lowercase
-    df.columns = df.columns.str.lower()
+    out = {name.lower(): col for name, col in out.items()}
 
-    return df
+    # Store identifiers as categoricals so joins compare integer codes
+    out = categorize_ids(out)
+
+    return pd.DataFrame(out, copy=False)
 
 # Function to clean and transform encounter data
 def clean_encounter_data(df):
@@ -157,7 +241,7 @@ def clean_encounter_data(df):
     with standardized patient and encounter information.
     """
     # Rename columns to standardized names
-    df.rename(columns={
+    df = df.rename(columns={
         'Id': 'encounter_id',
         'START': 'start_date',
         'STOP': 'stop_date',
@@ -173,18 +257,27 @@ def clean_encounter_data(df):
         'BASE_ENCOUNTER_COST': 'base_encounter_cost',
         'TOTAL_CLAIM_COST': 'total_claim_cost',
         'PAYER_COVERAGE': 'payer_coverage'
-    }, inplace=True)
+    })
+
+    # Drop redundant columns (they may already be projected away at read time)
+    out = dict(df.drop(columns=['encounter_description'], errors='ignore').items())
 
     # Standardize patient ID to lowercase
-    df['patient_id'] = df['patient_id'].str.lower()
+    out['patient_id'] = out['patient_id'].str.lower()
 
     # Ensure all column names are lowercase
-    df.columns = df.columns.str.lower()
-
-    # Drop redundant columns
-    df.drop(columns=['encounter_description'], inplace=True)
-
-    return df
+    out = {name.lower(): col for name, col in out.items()}
+
+    # Downcast numeric columns to the narrowest safe types (SNOMED codes can exceed Int32).
+    # IDs stay strings: encounters are cleaned batch by batch, and per-batch categories
+    # would not line up across batches, so share_id_codes categorizes them for the merge
+    return pd.DataFrame(out, copy=False).astype({
+        'base_encounter_cost': 'float32',
+        'total_claim_cost': 'float32',
+        'payer_coverage': 'float32',
+        'reason_code': 'Int64',
+        'code': 'Int64'
+    })
 
 # Function to merge patient data with gender data
 def merge_patients_and_gender(df_patients, df_gender):
@@ -192,20 +285,71 @@ def merge_patients_and_gender(df_patients, df_gender):
     Combines patient information with gender data using patient identifier,
     creating a comprehensive consolidated dataset.
     """
-    # Merge datasets on patient ID
-    df_merged = pd.merge(df_patients, df_gender, left_on='patient_id', right_on='Id', how='inner')
+    # Key the gender data by patient ID up front instead of merging on two ID columns
+    df_gender = df_gender.rename(columns={'Id': 'patient_id'}).set_index('patient_id')
 
-    # Drop unnecessary columns after merging
-    df_merged.drop(columns=['Id'], inplace=True)
+    # Join on the patient ID index
+    df_merged = df_patients.set_index('patient_id', drop=False).join(df_gender, how='inner')
+    df_merged = df_merged.reset_index(drop=True)
 
     print("Successfully merged the datasets based on 'patient_id'.")
 
     return df_merged
 
-# Generalized function to merge two datasets
-def merge_datasets(dataset1, dataset2, key_columns, how='left'):
+# Helper to view an identifier column as a categorical with plain string categories
+def as_id_category(ids):
+    """
+    Converts the identifier column to a categorical whose categories are plain strings,
+    whether it arrives as Arrow-backed strings or as a categorical, so the categories
+    of every dataset can be unified.
+    """
+    ids = ids.astype('category')
+    return ids.cat.rename_categories(ids.cat.categories.astype(str))
+
+# Helper to encode identifier columns against dictionaries shared by all datasets
+def share_id_codes(frames):
+    """
+    Unifies the categories of each identifier column across all datasets and swaps the
+    column for its integer codes, so joins hash and compare small integers.
+    Missing IDs keep a null code, so they never match each other in a join.
+    Returns the encoded datasets and the shared categories per column.
+    """
+    ids = [{col: as_id_category(frame[col]) for col in ID_COLS if col in frame} for frame in frames]
+
+    categories = {}
+    for col in ID_COLS:
+        categories[col] = union_categoricals([frame_ids[col] for frame_ids in ids if col in frame_ids]).categories
+
+    encoded = []
+    for frame, frame_ids in zip(frames, ids):
+        codes = {}
+        for col, col_ids in frame_ids.items():
+            col_codes = col_ids.cat.set_categories(categories[col]).cat.codes
+            codes[col] = col_codes.astype('Int32').mask(col_codes < 0)
+        encoded.append(frame.assign(**codes))
+
+    return encoded, categories
+
+# Generalized function to merge datasets onto a base dataset
+def merge_datasets(base, datasets, how='left'):
     """
-    Flexible dataset merging function that allows different join strategies
-    based on specified key columns.
+    Joins each (dataset, key_columns) pair onto the base dataset in a single lazy
+    Polars query plan, so no intermediate wide frame is materialized between joins.
+    Like a pandas left merge, the result keeps the row order of the base dataset.
     """
-    return dataset1.merge(dataset2, on=key_columns, how=how)
+    frames, categories = share_id_codes([base] + [dataset for dataset, _ in datasets])
+
+    plan = pl.from_pandas(frames[0]).lazy()
+    for dataset, (_, key_columns) in zip(frames[1:], datasets):
+        plan = plan.join(pl.from_pandas(dataset).lazy(), on=key_columns, how=how, maintain_order='left')
+
+    # Map the joined integer codes back to their identifiers; rows left unmatched by a
+    # left join carry null codes, which become -1 (missing) for `from_codes`
+    # Arrow-backed columns keep the narrow and nullable integer types through the round trip
+    merged = plan.collect().to_pandas(use_pyarrow_extension_array=True)
+    for col, col_categories in categories.items():
+        if col in merged:
+            codes = merged[col].fillna(-1).astype('int64')
+            merged[col] = pd.Categorical.from_codes(codes, col_categories)
+
+    return merged